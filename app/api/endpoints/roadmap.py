@@ -1,20 +1,83 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Optional, Union, List
+from fastapi.responses import StreamingResponse
+from typing import Optional, Union, List, Awaitable, AsyncIterator
 import asyncio
+import logging
+import orjson
 
 from app.models.weekly_roadmap import MonthlyRoadmap, MultiMonthRoadmap
-from app.services.weekly_roadmap_generator import WeeklyRoadmapGeneratorService
+from app.core.config import settings
+from app.services.weekly_roadmap_generator import WeeklyRoadmapGeneratorService, MonthGenerationError
+from app.services.persona_templates import get_persona_template
 from app.utils.validation import validate_monthly_roadmap
+from app.utils.rate_limiter import limit_user_concurrency
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+async def _stream_monthly_roadmaps(
+    tasks: List[Awaitable[MonthlyRoadmap]],
+    user_id: Optional[str],
+    persona_type: str,
+    duration_months: int
+) -> AsyncIterator[bytes]:
+    """Yield each monthly roadmap as an NDJSON line as soon as it completes
+    
+    Months arrive in completion order and carry their `requested_month`. A month
+    that fails produces an `error` line, also with its `requested_month`, instead
+    of aborting the stream. The last line is a summary with the combined goals
+    and overall date range.
+    """
+    pending = [asyncio.ensure_future(task) for task in tasks]
+    goals_by_month = {}
+    start_date = end_date = None
+    
+    try:
+        for next_completed in asyncio.as_completed(pending):
+            try:
+                roadmap = await next_completed
+            except Exception as e:
+                failed_month = e.month if isinstance(e, MonthGenerationError) else None
+                logger.warning("Error generating month %s in roadmap stream: %s", failed_month, e)
+                yield orjson.dumps({
+                    "requested_month": failed_month,
+                    "error": f"An error occurred while generating month {failed_month}: {str(e)}"
+                }) + b"\n"
+                continue
+            
+            goals_by_month[roadmap.requested_month] = roadmap.overall_goals
+            start_date = min(start_date, roadmap.start_date) if start_date else roadmap.start_date
+            end_date = max(end_date, roadmap.end_date) if end_date else roadmap.end_date
+            
+            yield roadmap.model_dump_json().encode() + b"\n"
+        
+        combined_goals = [goal for month in sorted(goals_by_month) for goal in goals_by_month[month]]
+        yield orjson.dumps({
+            "user_id": user_id,
+            "persona_type": persona_type,
+            "total_months": duration_months,
+            "combined_goals": list(dict.fromkeys(combined_goals)),
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None
+        }) + b"\n"
+    finally:
+        # Stop generating months nobody will receive, e.g. if the client disconnected
+        for task in pending:
+            task.cancel()
+
 # Removed the daily roadmap generator endpoint (/generate)
 
-@router.post("/generate", response_model=Union[MonthlyRoadmap, MultiMonthRoadmap])
+@router.post(
+    "/generate",
+    response_model=Union[MonthlyRoadmap, MultiMonthRoadmap],
+    dependencies=[Depends(limit_user_concurrency)]
+)
 async def generate_weekly_roadmap(
     persona_type: str,
     duration_months: int = 1,
     user_id: Optional[str] = None,
+    stream: bool = False,
     roadmap_generator: WeeklyRoadmapGeneratorService = Depends()
 ):
     """Generate a personalized roadmap based on persona type
@@ -23,9 +86,11 @@ async def generate_weekly_roadmap(
         persona_type: The personality type for roadmap generation
         duration_months: Number of months to generate (if >1, generates in parallel)
         user_id: Optional user identifier
+        stream: If true and duration_months>1, stream each month as NDJSON as soon as it is ready
     
     Returns:
-        MonthlyRoadmap if duration_months=1, MultiMonthRoadmap if duration_months>1
+        MonthlyRoadmap if duration_months=1, MultiMonthRoadmap if duration_months>1,
+        or an application/x-ndjson stream of MonthlyRoadmap lines followed by a summary line if stream=true
     """
     try:
         if not persona_type:
@@ -34,85 +99,53 @@ async def generate_weekly_roadmap(
         if duration_months < 1:
             raise HTTPException(status_code=400, detail="Duration months must be a positive integer")            # If duration_months is 1, generate a single month roadmap
         if duration_months == 1:
-            print(f"Generating single month roadmap for persona: {persona_type}, user_id: {user_id}")
+            # Known personas get a curated roadmap without a Gemini round-trip
+            if settings.USE_PERSONA_TEMPLATES:
+                template = get_persona_template(persona_type, user_id)
+                if template is not None:
+                    logger.debug("Serving persona template for persona=%s user_id=%s", persona_type, user_id)
+                    return template
+            
+            logger.debug("Generating single month roadmap for persona=%s user_id=%s", persona_type, user_id)
             roadmap = await roadmap_generator.generate_weekly_roadmap(persona_type, duration_months, user_id, current_month=1)
             # Validate the roadmap to ensure proper formatting
             validated_roadmap = validate_monthly_roadmap(roadmap)
-            print(f"Roadmap generated successfully with {len(validated_roadmap.weeks)} weeks")
+            logger.debug("Roadmap generated successfully with %d weeks", len(validated_roadmap.weeks))
             return validated_roadmap
         
         # If duration_months > 1, generate multiple months in parallel
-        print(f"Generating {duration_months} months of weekly roadmaps in parallel for persona: {persona_type}, user_id: {user_id}")
-        
-        # Special handling for large duration_months: use batching
-        if duration_months >= 12:
-            print(f"Using batched processing for {duration_months} months (batch size: 6)")
-            batch_size = 6
-            monthly_roadmaps = []
-            
-            # Process in batches of 6
-            for batch_start in range(1, duration_months + 1, batch_size):
-                batch_end = min(batch_start + batch_size, duration_months + 1)
-                batch_months = list(range(batch_start, batch_end))
-                
-                print(f"Processing batch: months {batch_months}")
-                
-                # Create tasks for this batch
-                batch_tasks = []
-                for current_month in batch_months:
-                    task = roadmap_generator.generate_weekly_roadmap(persona_type, duration_months, user_id, current_month=current_month)
-                    batch_tasks.append(task)
-                
-                # Execute batch in parallel and wait for completion
-                batch_results = await asyncio.gather(*batch_tasks)
-                monthly_roadmaps.extend(batch_results)
-                
-                print(f"Completed batch: months {batch_months}")
-        else:
-            # For smaller duration_months, process all in parallel
-            tasks = []
-            for current_month in range(1, duration_months + 1):
-                task = roadmap_generator.generate_weekly_roadmap(persona_type, duration_months, user_id, current_month=current_month)
-                tasks.append(task)
-            
-            # Execute all tasks in parallel
-            monthly_roadmaps = await asyncio.gather(*tasks)            # Apply validation to each monthly roadmap
-        validated_roadmaps = []
-        for roadmap in monthly_roadmaps:
-            validated_roadmaps.append(validate_monthly_roadmap(roadmap))
-            
-        # Combine all monthly roadmaps
-        combined_goals = []
-        for roadmap in validated_roadmaps:
-            combined_goals.extend(roadmap.overall_goals)
+        logger.debug("Generating %d months of weekly roadmaps in parallel for persona=%s user_id=%s", duration_months, persona_type, user_id)
         
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_goals = []
-        for goal in combined_goals:
-            if goal not in seen:
-                seen.add(goal)
-                unique_goals.append(goal)
+        if stream:
+            return StreamingResponse(
+                _stream_monthly_roadmaps(
+                    roadmap_generator.month_roadmap_tasks(persona_type, duration_months, user_id),
+                    user_id, persona_type, duration_months
+                ),
+                media_type="application/x-ndjson"
+            )
         
+        # Each month comes back validated and in month order
+        validated_roadmaps = await roadmap_generator.generate_full_roadmap(persona_type, duration_months, user_id)
+            
         # Create multi-month roadmap response
         multi_month_roadmap = MultiMonthRoadmap(
             user_id=user_id,
             persona_type=persona_type,
             total_months=duration_months,
             monthly_roadmaps=validated_roadmaps,
-            combined_goals=unique_goals,
             start_date=validated_roadmaps[0].start_date,
             end_date=validated_roadmaps[-1].end_date
         )
         
-        print(f"Multi-month roadmap generated successfully with {len(monthly_roadmaps)} months")
+        logger.debug("Multi-month roadmap generated successfully with %d months", len(validated_roadmaps))
         return multi_month_roadmap
         
     except HTTPException as he:
         # Re-raise HTTP exceptions as-is
         raise he
     except Exception as e:
-        print(f"Error in generate_weekly_roadmap endpoint: {str(e)}")
+        logger.error("Error in generate_weekly_roadmap endpoint: %s", e)
         if "API key" in str(e).lower():
             raise HTTPException(status_code=500, detail="API key error: Please check your Gemini API key configuration")
         elif "parse json" in str(e).lower() or "control character" in str(e).lower() or "decode" in str(e).lower():
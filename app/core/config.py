@@ -11,13 +11,40 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "AI Personal Guide"
     DEBUG: bool = True
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "https://yourfrontend.com"]
+    # Log level for the application's loggers (DEBUG, INFO, WARNING, ERROR)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
     # Gemini AI settings
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+    # Maximum number of Gemini calls in flight at once across all requests
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+
+    # Gemini response cache settings
+    # Policy is one of: enabled, replay, write-only, disabled
+    GEMINI_CACHE_POLICY: str = os.getenv("GEMINI_CACHE_POLICY", "enabled")
+    GEMINI_CACHE_TTL_SECONDS: int = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "86400"))
+    GEMINI_CACHE_MAX_ENTRIES: int = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "1024"))
+    GEMINI_CACHE_DIR: str = os.getenv("GEMINI_CACHE_DIR", "")
+
+    # Per-user concurrency limit for roadmap generation
+    USER_MAX_CONCURRENT_REQUESTS: int = int(os.getenv("USER_MAX_CONCURRENT_REQUESTS", "2"))
+    # In-flight requests older than this are considered abandoned
+    USER_REQUEST_TIMEOUT_SECONDS: int = int(os.getenv("USER_REQUEST_TIMEOUT_SECONDS", "300"))
+    # Also limit requests without a user_id, keyed by client address. Off by default:
+    # behind a reverse proxy, load balancer or NAT every anonymous caller shares one address
+    RATE_LIMIT_ANONYMOUS_BY_ADDRESS: bool = os.getenv("RATE_LIMIT_ANONYMOUS_BY_ADDRESS", "false").lower() == "true"
+    
+    # Serve curated roadmaps for known personas instead of calling Gemini (1-month requests only)
+    USE_PERSONA_TEMPLATES: bool = os.getenv("USE_PERSONA_TEMPLATES", "true").lower() == "true"
     
     # Tavily API settings
     TAVILY_API_KEY: str = os.getenv("TAVILY_API_KEY", "")
+    # Tavily search result cache settings
+    TAVILY_CACHE_TTL_SECONDS: int = int(os.getenv("TAVILY_CACHE_TTL_SECONDS", "3600"))
+    TAVILY_CACHE_MAX_ENTRIES: int = int(os.getenv("TAVILY_CACHE_MAX_ENTRIES", "4096"))
+    # Search once per week (combining its quests) instead of once per quest
+    TAVILY_COMBINE_WEEK_SEARCHES: bool = os.getenv("TAVILY_COMBINE_WEEK_SEARCHES", "true").lower() == "true"
     
     # # Database settings if needed
     # DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
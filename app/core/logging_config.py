@@ -0,0 +1,38 @@
+"""Application logging setup"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+from app.core.config import settings
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+
+def setup_logging() -> QueueListener:
+    """
+    Route log records through a queue to a background listener thread
+
+    Coroutines only enqueue records; formatting and writing to stderr happen on
+    the listener thread, so logging never blocks the event loop on I/O.
+
+    Returns:
+        The started QueueListener (stopped automatically at interpreter exit)
+    """
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+
+    # Only the application's own loggers follow LOG_LEVEL; libraries keep the root default
+    logging.getLogger("app").setLevel(settings.LOG_LEVEL.upper())
+
+    return listener
@@ -0,0 +1,64 @@
+import json
+import logging
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.models.weekly_roadmap import MonthlyRoadmap
+from app.utils.validation import validate_monthly_roadmap
+
+logger = logging.getLogger(__name__)
+
+PERSONA_TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "resources" / "personas"
+
+def _load_persona_templates() -> Dict[str, MonthlyRoadmap]:
+    """Load and validate the curated first-month roadmaps, keyed by lowercase persona type"""
+    templates = {}
+
+    for path in sorted(PERSONA_TEMPLATE_DIR.glob("*.json")):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+
+            # Dates are placeholders, they are replaced for every request
+            roadmap = MonthlyRoadmap(
+                persona_type=data["persona_type"],
+                duration_months=1,
+                requested_month=1,
+                start_date=date.today(),
+                end_date=date.today() + timedelta(days=30),
+                weeks=data["weeks"],
+                overall_goals=data["overall_goals"]
+            )
+            templates[roadmap.persona_type.strip().lower()] = validate_monthly_roadmap(roadmap)
+        except Exception as e:
+            logger.warning("Skipping invalid persona template %s: %s", path.name, e)
+
+    return templates
+
+# Loaded once at import so requests only pay for a copy
+_PERSONA_TEMPLATES = _load_persona_templates()
+
+def get_persona_template(persona_type: str, user_id: Optional[str] = None) -> Optional[MonthlyRoadmap]:
+    """
+    Get the curated first-month roadmap for a known persona type
+
+    Args:
+        persona_type: The personality type (case-insensitive)
+        user_id: Optional user identifier to set on the roadmap
+
+    Returns:
+        A fresh copy of the template dated from today, or None if the persona has no template
+    """
+    template = _PERSONA_TEMPLATES.get(persona_type.strip().lower())
+    if template is None:
+        return None
+
+    start_date = date.today()
+    return template.model_copy(
+        deep=True,
+        update={
+            "user_id": user_id,
+            "start_date": start_date,
+            "end_date": start_date + timedelta(days=30)
+        }
+    )
@@ -1,24 +1,39 @@
 from fastapi import Depends
 from datetime import date, time, timedelta, datetime
-import json
+from itertools import chain
+import asyncio
+import logging
 
 from app.models.roadmap import PersonalRoadmap, DailyCard, Task, TimeSlot
 from app.utils.gemini_client import GeminiClient
 from app.utils.tavily_client import TavilySearchClient
 
-class RoadmapGeneratorService:
-    def __init__(self, gemini_client: GeminiClient = Depends(), tavily_client: TavilySearchClient = Depends()):
-        self.gemini_client = gemini_client
-        self.tavily_client = tavily_client
-        
-    async def generate_roadmap(self, persona_type: str, duration_months: int, user_id: str = None) -> PersonalRoadmap:
-        """Generate a personalized roadmap based on persona type"""
-        # Calculate date range
-        start_date = date.today()
-        end_date = start_date + timedelta(days=30*duration_months)
-        
-        # Create a prompt for Gemini
-        prompt = f"""
+logger = logging.getLogger(__name__)
+
+# Allowed time_slot values and required fields, checked for every card/task
+_TIME_SLOT_VALUES = frozenset(e.value for e in TimeSlot)
+_REQUIRED_CARD_FIELDS = frozenset(["date", "focus_area", "tasks", "reflection_prompt"])
+_REQUIRED_TASK_FIELDS = frozenset(["title", "description", "start_time", "end_time",
+                                   "time_slot", "estimated_time", "priority"])
+
+def _check_roadmap_response(response_data) -> None:
+    """Raise if the Gemini JSON is missing the daily cards or goals"""
+    if not isinstance(response_data, dict) or "daily_cards" not in response_data or "overall_goals" not in response_data:
+        raise Exception("Invalid response structure: missing required fields")
+
+# Maximum number of concurrent Tavily searches per roadmap
+MAX_CONCURRENT_SEARCHES = 10
+
+def _parse_time(value: str) -> time:
+    """Parse an HH:MM time string, also accepting single-digit hours such as 8:00"""
+    try:
+        return time.fromisoformat(value)
+    except ValueError:
+        hours, minutes = value.split(":")[:2]
+        return time(int(hours), int(minutes))
+
+# Static prompt for daily roadmaps; only the placeholders vary per request
+PROMPT_TEMPLATE = """
         Create a personalized daily roadmap for a person with the personality type: {persona_type}.
         The roadmap should cover {duration_months} months starting from {start_date}.
         
@@ -60,44 +75,60 @@ class RoadmapGeneratorService:
         Each priority MUST be an integer between 1 and 5.
         """
 
+class RoadmapGeneratorService:
+    def __init__(self, gemini_client: GeminiClient = Depends(), tavily_client: TavilySearchClient = Depends()):
+        self.gemini_client = gemini_client
+        self.tavily_client = tavily_client
+        
+    async def generate_roadmap(self, persona_type: str, duration_months: int, user_id: str = None) -> PersonalRoadmap:
+        """Generate a personalized roadmap based on persona type"""
+        # Calculate date range
+        start_date = date.today()
+        end_date = start_date + timedelta(days=30*duration_months)
+        
+        # Create a prompt for Gemini
+        prompt = PROMPT_TEMPLATE.format_map({
+            "persona_type": persona_type,
+            "duration_months": duration_months,
+            "start_date": start_date,
+        })
+
         try:
             # Call Gemini API and parse response
-            response_data = await self.gemini_client.generate_content(prompt)
+            # Responses missing required fields are rejected before they are cached
+            response_data = await self.gemini_client.generate_content(prompt, validate=_check_roadmap_response)
             
-            # Validate response structure
-            if "daily_cards" not in response_data or "overall_goals" not in response_data:
-                raise Exception("Invalid response structure: missing required fields")
+            # Run the web searches for every task up front and concurrently,
+            # instead of awaiting them one at a time inside the loops below
+            web_resources_by_task = await self._search_task_resources(response_data["daily_cards"])
             
             # Process the response to convert string dates and times to proper objects
             processed_cards = []
             
-            for card in response_data["daily_cards"]:
+            for card_index, card in enumerate(response_data["daily_cards"]):
                 try:
                     # Validate card structure
-                    required_card_fields = ["date", "focus_area", "tasks", "reflection_prompt"]
-                    for field in required_card_fields:
-                        if field not in card:
-                            print(f"Missing required field '{field}' in card")
-                            raise Exception(f"Missing required field '{field}' in card")
+                    missing = _REQUIRED_CARD_FIELDS - card.keys()
+                    if missing:
+                        logger.debug("Missing required fields %s in card", sorted(missing))
+                        raise Exception(f"Missing required fields {sorted(missing)} in card")
                     
                     processed_tasks = []
-                    for task in card["tasks"]:
+                    for task_index, task in enumerate(card["tasks"]):
                         try:
                             # Validate task structure
-                            required_task_fields = ["title", "description", "start_time", "end_time", 
-                                                "time_slot", "estimated_time", "priority"]
-                            for field in required_task_fields:
-                                if field not in task:
-                                    print(f"Missing required field '{field}' in task")
-                                    raise Exception(f"Missing required field '{field}' in task")
+                            missing = _REQUIRED_TASK_FIELDS - task.keys()
+                            if missing:
+                                logger.debug("Missing required fields %s in task", sorted(missing))
+                                raise Exception(f"Missing required fields {sorted(missing)} in task")
                             
                             # Convert time strings to time objects
-                            start_time_parts = task["start_time"].split(":")
-                            end_time_parts = task["end_time"].split(":")
+                            start_time = _parse_time(task["start_time"])
+                            end_time = _parse_time(task["end_time"])
                             
                             # Validate time slot is one of the allowed values
-                            if task["time_slot"].lower() not in [e.value for e in TimeSlot]:
-                                print(f"Invalid time_slot value: {task['time_slot']}, using 'morning' as default")
+                            if task["time_slot"].lower() not in _TIME_SLOT_VALUES:
+                                logger.debug("Invalid time_slot value: %s, using 'morning' as default", task["time_slot"])
                                 time_slot = TimeSlot.MORNING
                             else:
                                 time_slot = task["time_slot"].lower()
@@ -105,19 +136,17 @@ class RoadmapGeneratorService:
                             # Get base resources
                             base_resources = task.get("resources", [])
                             
-                            # Enrich with web search resources
-                            web_resources = await self.enrich_resources_with_web_search(
-                                task["title"], task["description"]
-                            )
+                            # Web search resources fetched above
+                            web_resources = web_resources_by_task.get((card_index, task_index), [])
                             
                             # Combine resources, removing duplicates
-                            combined_resources = list(set(base_resources + web_resources))
+                            combined_resources = list(dict.fromkeys(chain(base_resources, web_resources)))
                             
                             processed_task = Task(
                                 title=task["title"],
                                 description=task["description"],
-                                start_time=time(int(start_time_parts[0]), int(start_time_parts[1])),
-                                end_time=time(int(end_time_parts[0]), int(end_time_parts[1])),
+                                start_time=start_time,
+                                end_time=end_time,
                                 time_slot=time_slot,
                                 estimated_time=task["estimated_time"],
                                 priority=task["priority"],
@@ -125,7 +154,7 @@ class RoadmapGeneratorService:
                             )
                             processed_tasks.append(processed_task)
                         except Exception as e:
-                            print(f"Error processing task: {str(e)}")
+                            logger.debug("Error processing task: %s", e)
                             # Skip this task but continue processing others
                             continue
                     
@@ -134,7 +163,7 @@ class RoadmapGeneratorService:
                     
                     # Ensure we have enough tasks (4-5)
                     if len(processed_tasks) < 4:
-                        print(f"Not enough valid tasks for card on {card['date']}")
+                        logger.debug("Not enough valid tasks for card on %s", card["date"])
                         raise Exception(f"Not enough valid tasks for card on {card['date']}")
                     
                     processed_card = DailyCard(
@@ -145,12 +174,14 @@ class RoadmapGeneratorService:
                     )
                     processed_cards.append(processed_card)
                 except Exception as e:
-                    print(f"Error processing card: {str(e)}")
+                    logger.debug("Error processing card: %s", e)
                     # Skip this card but continue processing others
                     continue
                     
             # Check if we have any processed cards
             if not processed_cards:
+                # Don't keep serving a response that could not be used
+                await self.gemini_client.evict(prompt)
                 raise Exception("No valid daily cards could be processed")
                 
             # Create and return the roadmap
@@ -166,7 +197,7 @@ class RoadmapGeneratorService:
             return roadmap
             
         except Exception as e:
-            print(f"Error generating roadmap: {str(e)}")
+            logger.error("Error generating roadmap: %s", e)
             raise Exception(f"Failed to generate roadmap: {str(e)}")
         
         # Convert response to PersonalRoadmap
@@ -182,6 +213,37 @@ class RoadmapGeneratorService:
         
         return roadmap
     
+    async def _search_task_resources(self, daily_cards: list) -> dict:
+        """
+        Fetch web resources for all tasks of all cards concurrently
+        
+        Args:
+            daily_cards: The raw daily cards returned by Gemini
+            
+        Returns:
+            Dict mapping (card index, task index) to a list of resource URLs
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+        
+        async def search(task: dict) -> list:
+            async with semaphore:
+                return await self.enrich_resources_with_web_search(task["title"], task["description"])
+        
+        task_keys = []
+        searches = []
+        for card_index, card in enumerate(daily_cards):
+            # Malformed cards and tasks are skipped later on, don't search for them
+            tasks = card.get("tasks") if isinstance(card, dict) else None
+            if not isinstance(tasks, list):
+                continue
+            for task_index, task in enumerate(tasks):
+                if isinstance(task, dict) and "title" in task and "description" in task:
+                    task_keys.append((card_index, task_index))
+                    searches.append(search(task))
+        
+        results = await asyncio.gather(*searches)
+        return dict(zip(task_keys, results))
+    
     async def enrich_resources_with_web_search(self, task_title: str, task_description: str) -> list:
         """
         Enhances task resources by performing a web search using Tavily API
@@ -206,5 +268,5 @@ class RoadmapGeneratorService:
             # Return resource URLs
             return [resource["url"] for resource in resources] if resources else []
         except Exception as e:
-            print(f"Error enriching resources with web search: {str(e)}")
+            logger.warning("Error enriching resources with web search: %s", e)
             return []
\ No newline at end of file
@@ -1,220 +1,657 @@
 from fastapi import Depends
 from datetime import date, timedelta, datetime
+from typing import Any, Dict, List, Awaitable
+from dataclasses import dataclass
+import asyncio
 import json
+import logging
+import re
+import string
 
+from app.core.config import settings
 from app.models.weekly_roadmap import MonthlyRoadmap, WeekPlan, WeeklyTask
 from app.utils.gemini_client import GeminiClient
 from app.utils.tavily_client import TavilySearchClient
-from app.utils.validation import validate_monthly_roadmap
+from app.utils.validation import validate_monthly_roadmap, format_activity
 
-class WeeklyRoadmapGeneratorService:
-    def __init__(self, gemini_client: GeminiClient = Depends(), tavily_client: TavilySearchClient = Depends()):
-        self.gemini_client = gemini_client
-        self.tavily_client = tavily_client
-        
-    async def generate_weekly_roadmap(self, persona_type: str, duration_months: int, user_id: str = None, current_month: int = 1) -> MonthlyRoadmap:
-        """Generate a personalized roadmap with weekly themes and quests
-        
-        Args:
-            persona_type: The personality type to tailor the roadmap for
-            duration_months: Total number of months in the program (also determines parallel generation)
-            user_id: Optional user identifier
-            current_month: Which specific month to generate (if not generating in parallel)
-            
-        Returns:
-            A MonthlyRoadmap for the specified month
-        """
-        # Calculate date range for this specific month
-        start_date = date.today() + timedelta(days=(current_month-1)*30)
-        end_date = start_date + timedelta(days=30)
-        
-        # Create a prompt for Gemini that highlights the month position in the program
-        # This ensures progression in difficulty and avoids repetition
-        prompt = f"""
-        Create a personalized roadmap for someone with a {persona_type} personality type.
-        This is month {current_month} of a {duration_months}-month program.
-        The roadmap should be for this specific month, starting from {start_date}.
+logger = logging.getLogger(__name__)
+
+# Maximum number of months generated concurrently for a single request
+MAX_CONCURRENT_MONTHS = 6
+
+# Above this many months a single response risks hitting Gemini's output token
+# limit, so months are generated with one call each instead
+MAX_MONTHS_PER_CALL = 3
+
+# Required fields, checked for every week/quest in the Gemini response
+_REQUIRED_WEEK_FIELDS = frozenset(["week_number", "theme", "quests"])
+_REQUIRED_QUEST_FIELDS = frozenset(["task_type", "task_name", "time_slot", "time_commitment", "activity"])
+
+# Web search settings per month: (difficulty keyword, search depth, max results).
+# Later months get harder queries, deeper searches and more resources
+_MONTH_PROFILE = {
+    1: ("", "basic", 4),
+    2: ("intermediate", "basic", 5),
+    3: ("advanced", "advanced", 6),
+    4: ("advanced", "advanced", 7),
+}
+_LATE_MONTH_PROFILE = ("expert", "advanced", 7)
+
+@dataclass(slots=True)
+class RawQuest:
+    """A quest from the Gemini response, checked for the required fields"""
+    task_type: str
+    task_name: str
+    time_slot: str
+    time_commitment: str
+    activity: Any
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "RawQuest":
+        missing = _REQUIRED_QUEST_FIELDS - data.keys()
+        if missing:
+            logger.debug("Missing required fields %s in quest", sorted(missing))
+            raise Exception(f"Missing required fields {sorted(missing)} in quest")
+        return cls(data["task_type"], data["task_name"], data["time_slot"], data["time_commitment"], data["activity"])
+
+@dataclass(slots=True)
+class RawWeek:
+    """A week from the Gemini response with its usable quests"""
+    week_number: int
+    theme: str
+    quests: List[RawQuest]
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "RawWeek":
+        """Build a week, skipping (and logging) quests that are missing fields"""
+        missing = _REQUIRED_WEEK_FIELDS - data.keys()
+        if missing:
+            logger.debug("Missing required fields %s in week data", sorted(missing))
+            raise Exception(f"Missing required fields {sorted(missing)} in week data")
         
-        {'This is the beginning of the program. Focus on foundational concepts.' if current_month == 1 else ''}
-        {'This is the middle of the program. Build upon earlier concepts and increase complexity.' if current_month > 1 and current_month < duration_months else ''}
-        {'This is the final month of the program. Focus on advanced techniques and practical application of all previous learning.' if current_month == duration_months and duration_months > 1 else ''}
+        quests = []
+        for quest in data["quests"]:
+            try:
+                quests.append(RawQuest.from_dict(quest))
+            except Exception as e:
+                logger.debug("Error processing quest: %s", e)
+                # Skip this quest but continue processing others
+                continue
         
-        Please structure the roadmap with:
-        1. Overall goals (include both short-term and long-term goals as a simple flat list of strings)
-        2. Weekly themes, where each week has a different focus
-        3. For each week, create 2-3 "quests" - specific learning tasks or activities
-        4. Each quest should have: 
+        return cls(data["week_number"], data["theme"], quests)
+
+def _check_month_response(response_data: Any) -> None:
+    """
+    Check that the Gemini JSON for one month can be turned into a roadmap
+    
+    Raises:
+        Exception: If goals or weeks are missing, or no week has a usable quest
+    """
+    if not isinstance(response_data, dict) or "weeks" not in response_data or "overall_goals" not in response_data:
+        raise Exception("Invalid response structure: missing required fields")
+    
+    for week_data in response_data["weeks"]:
+        try:
+            if RawWeek.from_dict(week_data).quests:
+                return
+        except Exception:
+            continue
+    raise Exception("Invalid response structure: no valid weeks")
+
+def _split_months(response_data: Any, duration_months: int) -> Dict[int, dict]:
+    """
+    Pick each month's JSON out of a multi-month Gemini response
+    
+    Raises:
+        Exception: If the response does not contain every month of the program
+    """
+    raw_months = response_data.get("months") if isinstance(response_data, dict) else None
+    if not isinstance(raw_months, list):
+        raise Exception("Invalid response structure: missing months")
+    
+    months_by_number = {}
+    for index, month_data in enumerate(raw_months, start=1):
+        if isinstance(month_data, dict):
+            months_by_number.setdefault(month_data.get("month_number", index), month_data)
+    
+    missing_months = [month for month in range(1, duration_months + 1) if month not in months_by_number]
+    if missing_months:
+        raise Exception(f"Invalid response structure: missing months {missing_months}")
+    
+    # Ignore any months past the end of the program
+    return {month: months_by_number[month] for month in range(1, duration_months + 1)}
+
+class MonthGenerationError(Exception):
+    """Generating one month of a multi-month roadmap failed; `month` says which"""
+    
+    def __init__(self, month: int, error: Exception):
+        super().__init__(str(error))
+        self.month = month
+
+# Quest fields and formatting rules, shared by the monthly and multi-month prompts
+_QUEST_FIELDS = """4. Each quest should have: 
            - task_type: Type of task (Learn/Build/Reflect/Collaborate/etc.)
            - task_name: Specific, descriptive name of the task
            - time_slot: ONLY the specific time of day when this could be done (e.g., "9:00 AM - 10:30 AM", "Evening: 7:00 PM - 8:00 PM")
            - time_commitment: ONLY the total weekly time investment (e.g., "5 hours/week", "2 hours every weekend")
            - activity: A step-by-step guide formatted as a numbered list (1., 2., 3., etc.) with each step on a new line
-           - DO NOT include resources for now, I will search for them separately
+           - DO NOT include resources for now, I will search for them separately"""
+
+_FORMATTING_NOTES = """IMPORTANT FORMATTING NOTES:
+        1. For overall_goals, provide a simple flat list of strings. DO NOT use a dictionary structure.
+        2. Keep time_slot ONLY for the time of day (e.g. "8:00 AM - 9:30 AM") 
+        3. Keep time_commitment ONLY for weekly duration (e.g. "3 hours/week")
+        4. DO NOT combine time_slot and time_commitment into a single field.
+        5. Activity MUST be formatted as numbered steps (1., 2., 3., etc.), with each step on a new line.
+           VERY IMPORTANT: For the activity field, use explicit \n for newlines in the JSON as shown in this example:
+           "activity": "1. Research the fundamentals of the topic\\n2. Complete practice exercises\\n3. Review and reflect on what was learned"
+           
+           DO NOT include actual line breaks in the JSON value - use the \\n escape sequence instead."""
+
+# Instructions shared by every monthly roadmap prompt. Kept identical across calls
+# and placed before the per-month details so Gemini can reuse the cached prefix
+ROADMAP_PROMPT_PREFIX = """
+        You create personalized monthly learning roadmaps tailored to a personality type.
+        
+        Please structure the roadmap with:
+        1. Overall goals (include both short-term and long-term goals as a simple flat list of strings)
+        2. Weekly themes, where each week has a different focus
+        3. For each week, create 2-3 "quests" - specific learning tasks or activities
+        """ + _QUEST_FIELDS + """
         
         Return your response as a JSON with the following structure:
-        {{
-          "user_id": "{user_id if user_id else 'user123'}",
-          "persona_type": "{persona_type}",
-          "start_date": "{start_date.isoformat()}",
-          "end_date": "{end_date.isoformat()}",
-          "duration_months": {duration_months},
-          "current_month": {current_month},
+        {
+          "persona_type": "<persona type>",
+          "start_date": "YYYY-MM-DD",
+          "end_date": "YYYY-MM-DD",
+          "duration_months": <total months>,
+          "current_month": <current month>,
           "overall_goals": [
             "Goal 1",
             "Goal 2", 
             "Goal 3"
           ],
           "weeks": [
-            {{
-              "week_number": {(current_month-1)*4 + 1},
-              "theme": "Theme for Week {(current_month-1)*4 + 1}",
+            {
+              "week_number": <first week number>,
+              "theme": "Theme for the week",
               "quests": [
-                {{
+                {
                   "task_type": "Learn",
                   "task_name": "Specific task name",
                   "time_slot": "9:00 AM - 10:30 AM",
                   "time_commitment": "4 hours/week",
                   "activity": "1. First step to complete this task\n2. Second step with more details\n3. Final step with expected outcome"
-                }}
+                }
               ]
-            }}
+            }
           ]
-        }}
+        }
         
-        Tailor the content specifically to the {persona_type} personality type.
-        {'Since this is month ' + str(current_month) + ' of the program, make sure to provide more ADVANCED content than what would be in month ' + str(current_month-1) + '.' if current_month > 1 else 'Provide foundational content appropriate for beginners.'}
-        {'The resources, tasks and activities should be significantly more advanced than previous months, focusing on mastery and real-world application.' if current_month > 2 else ''}
         Make the activities specific, challenging but achievable, and appropriate for the persona type.
         
-        IMPORTANT FORMATTING NOTES:
-        1. For overall_goals, provide a simple flat list of strings. DO NOT use a dictionary structure.
-        2. Keep time_slot ONLY for the time of day (e.g. "8:00 AM - 9:30 AM") 
-        3. Keep time_commitment ONLY for weekly duration (e.g. "3 hours/week")
-        4. DO NOT combine time_slot and time_commitment into a single field.
-        5. Activity MUST be formatted as numbered steps (1., 2., 3., etc.), with each step on a new line.
-           VERY IMPORTANT: For the activity field, use explicit \n for newlines in the JSON as shown in this example:
-           "activity": "1. Research the fundamentals of the topic\\n2. Complete practice exercises\\n3. Review and reflect on what was learned"
-           
-           DO NOT include actual line breaks in the JSON value - use the \\n escape sequence instead.
+        """ + _FORMATTING_NOTES + """
         Create exactly 4 weeks of content for this month.
-        For week numbers, use {(current_month-1)*4 + 1} to {current_month*4} to ensure continuity across the program.
         Important: For task_type, choose a specific category that best describes the activity (Learn, Build, Practice, Reflect, Research, Analyze, Collaborate, Network, Teach, Design, etc.) based on the actual content of each task.
+"""
+
+# Per-month part of the roadmap prompt, appended to ROADMAP_PROMPT_PREFIX
+_PROMPT_TEMPLATE = string.Template("""
+        Create a personalized roadmap for someone with a $persona_type personality type.
+        This is month $current_month of a $duration_months-month program.
+        The roadmap should be for this specific month, starting from $start_date.
+        
+        $stage_hint
+        
+        Use these values in the JSON:
+        "persona_type": "$persona_type",
+        "start_date": "$start_date",
+        "end_date": "$end_date",
+        "duration_months": $duration_months,
+        "current_month": $current_month
+        For week numbers, use $week_start to $week_end to ensure continuity across the program.
+        
+        Tailor the content specifically to the $persona_type personality type.
+        $progression_hint
+        $advanced_hint
+        """)
+
+# Prompt for generating every month of a short program in one call, see generate_multi_month
+_MULTI_MONTH_PROMPT_TEMPLATE = string.Template("""
+        Create a personalized $duration_months-month roadmap for someone with a $persona_type personality type,
+        starting from $start_date.
+        Each month must build on the previous one: month 1 focuses on foundational concepts,
+        later months increase complexity, and the final month focuses on advanced techniques
+        and practical application of all previous learning.
+        
+        For EACH month, provide:
+        1. Overall goals for that month (a simple flat list of strings)
+        2. Exactly 4 weekly themes, where each week has a different focus
+        3. For each week, 2-3 "quests" - specific learning tasks or activities
+        """ + _QUEST_FIELDS + """
+        
+        Return your response as a JSON with the following structure:
+        {
+          "months": [
+            {
+              "month_number": 1,
+              "overall_goals": [
+                "Goal 1",
+                "Goal 2"
+              ],
+              "weeks": [
+                {
+                  "week_number": 1,
+                  "theme": "Theme for Week 1",
+                  "quests": [
+                    {
+                      "task_type": "Learn",
+                      "task_name": "Specific task name",
+                      "time_slot": "9:00 AM - 10:30 AM",
+                      "time_commitment": "4 hours/week",
+                      "activity": "1. First step to complete this task\\n2. Second step with more details\\n3. Final step with expected outcome"
+                    }
+                  ]
+                }
+              ]
+            }
+          ]
+        }
+        
+        Tailor the content specifically to the $persona_type personality type.
+        Make the activities specific, challenging but achievable, and appropriate for the persona type.
+        
+        """ + _FORMATTING_NOTES + """
+        6. Include exactly $duration_months entries in "months", with month_number 1 to $duration_months.
+        7. Number weeks continuously across the program: month N uses week numbers 4*(N-1)+1 to 4*N.
+        """)
+
+_BEGINNING_HINT = "This is the beginning of the program. Focus on foundational concepts."
+_MIDDLE_HINT = "This is the middle of the program. Build upon earlier concepts and increase complexity."
+_FINAL_HINT = "This is the final month of the program. Focus on advanced techniques and practical application of all previous learning."
+_MASTERY_HINT = "The resources, tasks and activities should be significantly more advanced than previous months, focusing on mastery and real-world application."
+_FOUNDATIONAL_HINT = "Provide foundational content appropriate for beginners."
+_ADVANCING_HINT = string.Template(
+    "Since this is month $current_month of the program, make sure to provide more ADVANCED content than what would be in month $previous_month."
+)
+
+# (first month, final month, past month 2) -> (stage hint, advanced hint)
+_MONTH_HINTS = {
+    (True, False, False): (_BEGINNING_HINT, ""),
+    (True, True, False): (_BEGINNING_HINT, ""),
+    (False, False, False): (_MIDDLE_HINT, ""),
+    (False, True, False): (_FINAL_HINT, ""),
+    (False, False, True): (_MIDDLE_HINT, _MASTERY_HINT),
+    (False, True, True): (_FINAL_HINT, _MASTERY_HINT),
+}
+
+# Tavily returns at most this many results per search
+MAX_TAVILY_RESULTS = 20
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def _tokenize(text: str) -> set:
+    """Lowercase word tokens of a text, used to match search results to quests"""
+    return set(_WORD_RE.findall(text.lower()))
+
+def _distribute_results(results: List[dict], task_names: List[str], per_quest_limit: int) -> List[list]:
+    """
+    Split the results of a combined search between the quests it was made for
+    
+    Each result goes to the quest with the highest token Jaccard similarity between
+    its task name and the result's title and content. Ties (including no overlap at
+    all) go to the quest with the fewest resources so far.
+    
+    Args:
+        results: Tavily search results
+        task_names: Task name of each quest
+        per_quest_limit: Maximum number of URLs per quest
+        
+    Returns:
+        One list of resource URLs per quest, in quest order
+    """
+    quest_tokens = [_tokenize(name) for name in task_names]
+    assigned = [[] for _ in task_names]
+    
+    for result in results:
+        url = result.get("url")
+        if not url:
+            continue
+        
+        open_quests = [i for i in range(len(assigned)) if len(assigned[i]) < per_quest_limit]
+        if not open_quests:
+            break
+        
+        result_tokens = _tokenize(f"{result.get('title', '')} {result.get('content', '')}")
+        
+        def score(i):
+            union = quest_tokens[i] | result_tokens
+            similarity = len(quest_tokens[i] & result_tokens) / len(union) if union else 0.0
+            return similarity, -len(assigned[i])
+        
+        assigned[max(open_quests, key=score)].append(url)
+    
+    return assigned
+
+class WeeklyRoadmapGeneratorService:
+    def __init__(self, gemini_client: GeminiClient = Depends(), tavily_client: TavilySearchClient = Depends()):
+        self.gemini_client = gemini_client
+        self.tavily_client = tavily_client
+        
+    async def generate_weekly_roadmap(self, persona_type: str, duration_months: int, user_id: str = None, current_month: int = 1) -> MonthlyRoadmap:
+        """Generate a personalized roadmap with weekly themes and quests
+        
+        Args:
+            persona_type: The personality type to tailor the roadmap for
+            duration_months: Total number of months in the program (also determines parallel generation)
+            user_id: Optional user identifier
+            current_month: Which specific month to generate (if not generating in parallel)
+            
+        Returns:
+            A MonthlyRoadmap for the specified month
         """
+        # Calculate date range for this specific month
+        start_date = date.today() + timedelta(days=(current_month-1)*30)
+        end_date = start_date + timedelta(days=30)
+        
+        # The fixed instructions come first (ROADMAP_PROMPT_PREFIX) so every call shares
+        # the same prompt prefix; only the short suffix varies per persona and month.
+        # It highlights the month position in the program to ensure progression in
+        # difficulty and avoid repetition. It leaves out user_id (the roadmap takes it
+        # from the argument, not the response) so users asking for the same persona
+        # and month share one cached or in-flight Gemini call
+        stage_hint, advanced_hint = _MONTH_HINTS[
+            (current_month == 1, current_month == duration_months, current_month > 2)
+        ]
+        if current_month > 1:
+            progression_hint = _ADVANCING_HINT.substitute(
+                current_month=current_month, previous_month=current_month - 1
+            )
+        else:
+            progression_hint = _FOUNDATIONAL_HINT
+        
+        prompt = ROADMAP_PROMPT_PREFIX + _PROMPT_TEMPLATE.substitute(
+            persona_type=persona_type,
+            current_month=current_month,
+            duration_months=duration_months,
+            stage_hint=stage_hint,
+            progression_hint=progression_hint,
+            advanced_hint=advanced_hint,
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat(),
+            week_start=(current_month-1)*4 + 1,
+            week_end=current_month*4
+        )
 
         try:
-            # Call Gemini API and parse response            git commit -m "Add weekly roadmap generator with multi-month support"
-            response_data = await self.gemini_client.generate_content(prompt)
+            # Call Gemini API and parse response
+            response_data = await self.gemini_client.generate_content(prompt, validate=_check_month_response)
             
-            # Validate response structure
-            if "weeks" not in response_data or "overall_goals" not in response_data:
-                raise Exception("Invalid response structure: missing required fields")
+            try:
+                roadmap = await self._build_monthly_roadmap(
+                    response_data, persona_type, duration_months, user_id, current_month, start_date, end_date
+                )
+            except Exception:
+                # Don't keep serving a response that could not be used
+                await self.gemini_client.evict(prompt)
+                raise
             
-            # Process the response
-            processed_weeks = []
+            # Validate and ensure proper formatting of all activities
+            roadmap = validate_monthly_roadmap(roadmap)
+            return roadmap
             
-            for week_data in response_data["weeks"]:
+        except Exception as e:
+            logger.error("Error generating weekly roadmap: %s", e)
+            raise Exception(f"Failed to generate weekly roadmap: {str(e)}")
+    
+    async def generate_full_roadmap(self, persona_type: str, duration_months: int, user_id: str = None) -> List[MonthlyRoadmap]:
+        """Generate every month of a multi-month program
+        
+        Short programs are generated with a single Gemini call (see generate_multi_month);
+        otherwise, or if that fails, all months are generated in parallel.
+        
+        Args:
+            persona_type: The personality type to tailor the roadmap for
+            duration_months: Total number of months in the program
+            user_id: Optional user identifier
+            
+        Returns:
+            One validated MonthlyRoadmap per month, in month order
+        """
+        if duration_months <= MAX_MONTHS_PER_CALL:
+            try:
+                return await self.generate_multi_month(persona_type, duration_months, user_id)
+            except Exception as e:
+                logger.warning("Single-call generation failed, falling back to one call per month: %s", e)
+        
+        return list(await asyncio.gather(*self.month_roadmap_tasks(persona_type, duration_months, user_id)))
+    
+    def month_roadmap_tasks(self, persona_type: str, duration_months: int, user_id: str = None) -> List[Awaitable[MonthlyRoadmap]]:
+        """Create one generate_weekly_roadmap call per month, at most MAX_CONCURRENT_MONTHS running at once
+        
+        A new month starts as soon as any running one finishes. Each result is
+        already validated and carries its month in `requested_month`; a failed
+        month raises MonthGenerationError with the month number.
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_MONTHS)
+        
+        async def generate_month(current_month: int) -> MonthlyRoadmap:
+            async with semaphore:
                 try:
-                    # Validate week structure
-                    required_week_fields = ["week_number", "theme", "quests"]
-                    for field in required_week_fields:
-                        if field not in week_data:
-                            print(f"Missing required field '{field}' in week data")
-                            raise Exception(f"Missing required field '{field}' in week data")
-                    
-                    processed_tasks = []
-                    for quest in week_data["quests"]:
-                        try:
-                            # Validate quest structure
-                            required_task_fields = ["task_type", "task_name", "time_slot", "time_commitment", "activity"]
-                            for field in required_task_fields:
-                                if field not in quest:
-                                    print(f"Missing required field '{field}' in quest")
-                                    raise Exception(f"Missing required field '{field}' in quest")
-                            
-                            # Generate resources based on task information
-                            # Pass the current_month parameter to get progressively more advanced resources
-                            web_resources = await self.enrich_resources_with_web_search(
-                                quest["task_name"], quest["activity"], current_month
-                            )
-                            
-                            # Extract activity from the quest
-                            activity = quest["activity"]
-                                
-                            # The format_activity function will handle all formatting
-                            from app.utils.validation import format_activity
-                            formatted_activity = format_activity(activity)
-                            
-                            processed_task = WeeklyTask(
-                                task_name=quest["task_name"],
-                                resources=web_resources,
-                                time_slot=quest["time_slot"],
-                                time_commitment=quest["time_commitment"],
-                                practice=formatted_activity
-                            )
-                            processed_tasks.append(processed_task)
-                        except Exception as e:
-                            print(f"Error processing quest: {str(e)}")
-                            # Skip this quest but continue processing others
-                            continue
-                    
-                    # Ensure we have tasks
-                    if not processed_tasks:
-                        print(f"No valid quests for week {week_data['week_number']}")
-                        raise Exception(f"No valid quests for week {week_data['week_number']}")
-                    
-                    processed_week = WeekPlan(
-                        week_number=week_data["week_number"],
-                        tasks=processed_tasks
-                    )
-                    processed_weeks.append(processed_week)
+                    return await self.generate_weekly_roadmap(persona_type, duration_months, user_id, current_month=current_month)
                 except Exception as e:
-                    print(f"Error processing week: {str(e)}")
-                    # Skip this week but continue processing others
-                    continue
-                 # Check if we have any processed weeks
-            if not processed_weeks:
-                raise Exception("No valid weeks could be processed")
+                    raise MonthGenerationError(current_month, e) from e
+        
+        return [generate_month(current_month) for current_month in range(1, duration_months + 1)]
+    
+    async def generate_multi_month(self, persona_type: str, duration_months: int, user_id: str = None) -> List[MonthlyRoadmap]:
+        """Generate every month of the program with a single Gemini call
+        
+        Args:
+            persona_type: The personality type to tailor the roadmap for
+            duration_months: Total number of months in the program
+            user_id: Optional user identifier
+            
+        Returns:
+            One MonthlyRoadmap per month, in month order
+            
+        Raises:
+            Exception: If the response cannot be parsed or does not contain every month;
+                callers can fall back to generate_weekly_roadmap per month
+        """
+        month_dates = {
+            month: (date.today() + timedelta(days=(month-1)*30), date.today() + timedelta(days=month*30))
+            for month in range(1, duration_months + 1)
+        }
+        
+        prompt = _MULTI_MONTH_PROMPT_TEMPLATE.substitute(
+            persona_type=persona_type,
+            duration_months=duration_months,
+            start_date=month_dates[1][0].isoformat()
+        )
+        
+        def check_response(response_data: Any) -> None:
+            for month_data in _split_months(response_data, duration_months).values():
+                _check_month_response(month_data)
+        
+        response_data = await self.gemini_client.generate_content(prompt, validate=check_response)
+        months_by_number = _split_months(response_data, duration_months)
+        
+        # Build the months concurrently so their web searches overlap
+        builds = [
+            asyncio.ensure_future(self._build_monthly_roadmap(
+                months_by_number[month], persona_type, duration_months, user_id, month, start_date, end_date
+            ))
+            for month, (start_date, end_date) in month_dates.items()
+        ]
+        try:
+            roadmaps = await asyncio.gather(*builds)
+        except Exception:
+            # One failed month fails the call, so stop building the others
+            for build in builds:
+                build.cancel()
+            # Don't keep serving a response that could not be used
+            await self.gemini_client.evict(prompt)
+            raise
+        return [validate_monthly_roadmap(roadmap) for roadmap in roadmaps]
+    
+    async def _build_monthly_roadmap(self, response_data: dict, persona_type: str, duration_months: int,
+                                     user_id: str, current_month: int, start_date: date, end_date: date) -> MonthlyRoadmap:
+        """
+        Convert the parsed Gemini JSON for one month into a MonthlyRoadmap
+        
+        Args:
+            response_data: Parsed JSON with "weeks" and "overall_goals" for a single month
+            persona_type: The personality type the roadmap is for
+            duration_months: Total number of months in the program
+            user_id: Optional user identifier
+            current_month: Which month of the program this is
+            start_date: First day of the month
+            end_date: Last day of the month
+            
+        Returns:
+            The MonthlyRoadmap with web resources attached to each task
+        """
+        # Validate response structure
+        if "weeks" not in response_data or "overall_goals" not in response_data:
+            raise Exception("Invalid response structure: missing required fields")
+        
+        # First pass: validate week/quest structure and collect the usable quests
+        valid_weeks = []
+        
+        for week_data in response_data["weeks"]:
+            try:
+                valid_weeks.append(RawWeek.from_dict(week_data))
+            except Exception as e:
+                logger.debug("Error processing week: %s", e)
+                # Skip this week but continue processing others
+                continue
+        
+        # Run the web searches for all weeks concurrently
+        # Pass the current_month parameter to get progressively more advanced resources
+        resources_by_week = await asyncio.gather(
+            *[self.enrich_week_with_web_search(week.quests, current_month) for week in valid_weeks],
+            return_exceptions=True
+        )
+        
+        # Second pass: build the weeks with the search results
+        processed_weeks = []
+        
+        for week, quest_resources in zip(valid_weeks, resources_by_week):
+            # BaseException: a cancelled search comes back as CancelledError
+            if isinstance(quest_resources, BaseException):
+                quest_resources = [[] for _ in week.quests]
+            
+            try:
+                processed_tasks = []
+                for quest, web_resources in zip(week.quests, quest_resources):
+                    try:
+                        # The format_activity function will handle all formatting
+                        formatted_activity = format_activity(quest.activity)
+                        
+                        processed_task = WeeklyTask(
+                            task_name=quest.task_name,
+                            resources=web_resources,
+                            time_slot=quest.time_slot,
+                            time_commitment=quest.time_commitment,
+                            practice=formatted_activity
+                        )
+                        processed_tasks.append(processed_task)
+                    except Exception as e:
+                        logger.debug("Error processing quest: %s", e)
+                        # Skip this quest but continue processing others
+                        continue
                 
-            # Process overall_goals to ensure it's in the correct format (list of strings)
+                # Ensure we have tasks
+                if not processed_tasks:
+                    logger.debug("No valid quests for week %s", week.week_number)
+                    raise Exception(f"No valid quests for week {week.week_number}")
+                
+                processed_week = WeekPlan(
+                    week_number=week.week_number,
+                    tasks=processed_tasks
+                )
+                processed_weeks.append(processed_week)
+            except Exception as e:
+                logger.debug("Error processing week: %s", e)
+                # Skip this week but continue processing others
+                continue
+        
+        # Check if we have any processed weeks
+        if not processed_weeks:
+            raise Exception("No valid weeks could be processed")
+            
+        # Process overall_goals to ensure it's in the correct format (list of strings)
+        overall_goals = []
+        raw_goals = response_data.get("overall_goals", [])
+        
+        # Handle case where overall_goals might be a dictionary with nested lists
+        if isinstance(raw_goals, dict):
+            # Extract goals from dictionary format (e.g., {"short_term": [...], "long_term": [...]})
+            for goal_type, goals in raw_goals.items():
+                if isinstance(goals, list):
+                    overall_goals.extend(goals)
+                elif isinstance(goals, str):
+                    # Handle case where the value itself is a string not a list
+                    overall_goals.append(f"{goal_type}: {goals}")
+        elif isinstance(raw_goals, list):
+            # Already the right format
+            overall_goals = raw_goals
+        else:
+            # Fallback - create an empty list
             overall_goals = []
-            raw_goals = response_data.get("overall_goals", [])
             
-            # Handle case where overall_goals might be a dictionary with nested lists
-            if isinstance(raw_goals, dict):
-                # Extract goals from dictionary format (e.g., {"short_term": [...], "long_term": [...]})
-                for goal_type, goals in raw_goals.items():
-                    if isinstance(goals, list):
-                        overall_goals.extend(goals)
-                    elif isinstance(goals, str):
-                        # Handle case where the value itself is a string not a list
-                        overall_goals.append(f"{goal_type}: {goals}")
-            elif isinstance(raw_goals, list):
-                # Already the right format
-                overall_goals = raw_goals
-            else:
-                # Fallback - create an empty list
-                overall_goals = []
-                
-            # Create the personalized roadmap
-            roadmap = MonthlyRoadmap(
-                user_id=user_id,
-                persona_type=persona_type,
-                duration_months=duration_months,
-                requested_month=current_month,  # Use the specified month
-                start_date=start_date,
-                end_date=end_date,
-                weeks=processed_weeks,
-                overall_goals=overall_goals
-            )
+        # Create the personalized roadmap
+        return MonthlyRoadmap(
+            user_id=user_id,
+            persona_type=persona_type,
+            duration_months=duration_months,
+            requested_month=current_month,  # Use the specified month
+            start_date=start_date,
+            end_date=end_date,
+            weeks=processed_weeks,
+            overall_goals=overall_goals
+        )
+
+    async def enrich_week_with_web_search(self, quests: List[RawQuest], current_month: int = 1) -> List[list]:
+        """
+        Find web resources for all quests of a week with a single Tavily search
+        
+        The task names are combined into one query and each result goes to the quest
+        whose name it overlaps most. Falls back to one search per quest when combined
+        searches are disabled or the combined query would be too long.
+        
+        Args:
+            quests: The week's validated quests
+            current_month: Current month in the program to adjust resource complexity
             
-            # Validate and ensure proper formatting of all activities
-            roadmap = validate_monthly_roadmap(roadmap)
-            return roadmap
+        Returns:
+            One list of resource URLs per quest, in quest order
+        """
+        difficulty_level, search_depth, max_results = _MONTH_PROFILE.get(current_month, _LATE_MONTH_PROFILE)
+        # The model may return a missing or non-string task name; don't let one bad
+        # quest cost the whole week its resources
+        task_names = [str(quest.task_name or "") for quest in quests]
+        combined_query = f"{' | '.join(name[:60] for name in task_names)} {difficulty_level}".strip()
+        
+        if not settings.TAVILY_COMBINE_WEEK_SEARCHES or len(quests) < 2 or len(combined_query) > 390:
+            return list(await asyncio.gather(
+                *[self.enrich_resources_with_web_search(quest.task_name, quest.activity, current_month)
+                  for quest in quests]
+            ))
+        
+        try:
+            search_results = await self.tavily_client.search(
+                query=combined_query,
+                search_depth=search_depth,
+                max_results=min(max_results * len(quests), MAX_TAVILY_RESULTS)
+            )
             
+            return _distribute_results(search_results.get("results", []), task_names, max_results)
         except Exception as e:
-            print(f"Error generating weekly roadmap: {str(e)}")
-            raise Exception(f"Failed to generate weekly roadmap: {str(e)}")
-    
+            logger.warning("Error enriching week resources with web search: %s", e)
+            return [[] for _ in quests]
+
     async def enrich_resources_with_web_search(self, task_name: str, practice, current_month: int = 1) -> list:
         """
         Enhances task resources by performing a web search using Tavily API
@@ -228,15 +665,8 @@ class WeeklyRoadmapGeneratorService:
             List of resource URLs
         """
         try:
-            # Create a search query based on the task details and current month
-            difficulty_level = ""
-            if current_month > 1:
-                if current_month <= 2:
-                    difficulty_level = "intermediate"
-                elif current_month <= 4:
-                    difficulty_level = "advanced"
-                else:
-                    difficulty_level = "expert"
+            # Difficulty keyword, search depth and result count for this month of the program
+            difficulty_level, search_depth, max_results = _MONTH_PROFILE.get(current_month, _LATE_MONTH_PROFILE)
             
             # Convert practice to string if it's a list
             if isinstance(practice, list):
@@ -253,7 +683,8 @@ class WeeklyRoadmapGeneratorService:
             # Extract just the first point from the practice if it contains numbered steps
             truncated_practice = ""
             if practice and isinstance(practice, str) and "1." in practice:
-                first_step = practice.split("2.")[0] if "2." in practice else practice
+                second_step = practice.find("2.")
+                first_step = practice[:second_step] if second_step != -1 else practice
                 # Remove the "1. " prefix if present
                 if first_step.startswith("1."):
                     first_step = first_step[2:].strip()
@@ -275,10 +706,6 @@ class WeeklyRoadmapGeneratorService:
             if len(search_query) > 390:
                 search_query = search_query[:390]
             
-            # Perform web search with increased depth for later months
-            search_depth = "basic" if current_month <= 2 else "advanced"
-            max_results = 3 + min(current_month, 4)  # More resources for later months (up to 7)
-            
             # Perform web search
             search_results = await self.tavily_client.search(
                 query=search_query, 
@@ -286,11 +713,8 @@ class WeeklyRoadmapGeneratorService:
                 max_results=max_results
             )
             
-            # Extract useful resources
-            resources = await self.tavily_client.extract_resource_info(search_results)
-            
             # Return resource URLs
-            return [resource["url"] for resource in resources] if resources else []
+            return self.tavily_client.extract_urls(search_results)
         except Exception as e:
-            print(f"Error enriching resources with web search: {str(e)}")
+            logger.warning("Error enriching resources with web search: %s", e)
             return []
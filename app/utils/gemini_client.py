@@ -1,53 +1,135 @@
-import json
+import asyncio
+import logging
+import re
+import orjson
 import google.generativeai as genai
-from typing import Dict, Any
+from google.api_core import exceptions as google_exceptions
+from fastapi import Depends
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
 
 from app.core.config import settings
 from app.utils.json_sanitizer import safe_parse_json, sanitize_json_string
+from app.utils.response_cache import ResponseCache, CacheMissError, get_gemini_response_cache
+from app.utils.single_flight import SingleFlight
+from app.utils.retry import retry_async
+
+logger = logging.getLogger(__name__)
+
+# Payload of a ```/```json code fence: up to the last closing fence, so fences
+# inside string values are kept, or to the end if the fence is never closed
+_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)(?:```(?!.*```)|\Z)', re.DOTALL)
+
+# Identical prompts issued concurrently (e.g. several users requesting the same
+# persona on a cold cache) share a single Gemini call
+_inflight_requests = SingleFlight()
+
+# Upper bound on concurrent Gemini calls across all requests, to stay within quota
+_gemini_semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+
+# Rate limiting, overload and timeouts; other API errors (bad key, invalid prompt) fail immediately
+_TRANSIENT_GEMINI_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+)
+
+def _is_transient_gemini_error(error: Exception) -> bool:
+    """Whether a failed Gemini call is worth retrying"""
+    return isinstance(error, _TRANSIENT_GEMINI_ERRORS)
+
+@lru_cache(maxsize=1)
+def _get_model() -> genai.GenerativeModel:
+    """Configure Gemini once per process so its transport and connections are reused across requests"""
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai.GenerativeModel(settings.GEMINI_MODEL)
 
 class GeminiClient:
-    def __init__(self):
-        # Configure the Gemini client
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    def __init__(self, response_cache: ResponseCache = Depends(get_gemini_response_cache)):
+        # Shared Gemini model, see _get_model
+        self.model = _get_model()
+        self.response_cache = response_cache
     
     # We've moved the JSON normalization code to the json_sanitizer.py utility
         
-    async def generate_content(self, prompt: str) -> Dict[str, Any]:
-        """Generate content using Gemini AI"""
+    async def generate_content(self, prompt: str, validate: Optional[Callable[[Any], None]] = None) -> Dict[str, Any]:
+        """
+        Generate content using Gemini AI, served from the response cache when possible
+        
+        Args:
+            prompt: The prompt to send
+            validate: Optional check of the parsed response that raises if it is unusable.
+                Only responses that pass are cached, so a bad reply is not replayed on retry
+            
+        Returns:
+            The parsed JSON response
+        """
+        cache_key = self._cache_key(prompt)
+
+        cached = await self.response_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Gemini response cache hit for prompt: %s...", prompt[:100])
+            return cached
+
+        if self.response_cache.policy == "replay":
+            raise CacheMissError(f"No cached Gemini response for prompt: {prompt[:100]}...")
+
+        return await _inflight_requests.do(cache_key, lambda: self._generate_and_cache(prompt, cache_key, validate))
+
+    async def evict(self, prompt: str) -> None:
+        """Drop the cached response for a prompt, e.g. when the caller could not use it"""
+        await self.response_cache.delete(self._cache_key(prompt))
+
+    @staticmethod
+    def _cache_key(prompt: str) -> str:
+        return ResponseCache.make_key(prompt, settings.GEMINI_MODEL)
+
+    async def _generate_and_cache(self, prompt: str, cache_key: str,
+                                  validate: Optional[Callable[[Any], None]]) -> Dict[str, Any]:
+        response_data = await self._generate_uncached(prompt)
+        if validate is not None:
+            validate(response_data)
+        await self.response_cache.set(cache_key, response_data)
+        return response_data
+
+    async def _generate_uncached(self, prompt: str) -> Dict[str, Any]:
+        """Call Gemini and parse the JSON response"""
         try:
-            print(f"Sending prompt to Gemini: {prompt[:100]}...")
-            response = self.model.generate_content(prompt)
+            logger.debug("Sending prompt to Gemini: %s...", prompt[:100])
+            # Async call so concurrent months/requests don't block the event loop.
+            # Transient failures are retried; the semaphore is released while backing off
+            async def call_gemini():
+                async with _gemini_semaphore:
+                    return await self.model.generate_content_async(prompt)
+            
+            response = await retry_async(call_gemini, _is_transient_gemini_error)
             
             # Parse the response as JSON
             response_text = response.text
-            print(f"Received response from Gemini: {response_text[:100]}...")
+            logger.debug("Received response from Gemini: %s...", response_text[:100])
             
-            # Handle potential formatting issues
-            if "```json" in response_text:
-                json_start = response_text.find("```json") + 7
-                json_end = response_text.rfind("```")
-                response_text = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.find("```") + 3
-                json_end = response_text.rfind("```")
-                response_text = response_text[json_start:json_end].strip()
+            # Handle potential formatting issues: strip a surrounding code fence
+            fence = _FENCE_RE.search(response_text)
+            if fence:
+                response_text = fence.group(1).strip()
                 
             try:
                 # Use our specialized JSON parser with multiple fallback methods
                 return safe_parse_json(response_text)
             except Exception as json_err:
-                print(f"JSON Decode Error: {str(json_err)}")
-                print(f"Response text: {response_text}")
+                logger.warning("JSON Decode Error: %s", json_err)
+                logger.debug("Response text: %s", response_text)
                 
                 # Even if safe_parse_json fails, try one more time with a direct sanitization
                 try:
                     sanitized_text = sanitize_json_string(response_text)
-                    return json.loads(sanitized_text)
+                    return orjson.loads(sanitized_text)
                 except Exception as e:
-                    print(f"All parsing attempts failed: {str(e)}")
+                    logger.error("All parsing attempts failed: %s", e)
                     raise Exception(f"Failed to parse JSON response: {str(json_err)}")
         except Exception as e:
             # Log the error and return a simplified error response
-            print(f"Error generating content: {str(e)}")
+            logger.error("Error generating content: %s", e)
             raise Exception(f"Failed to generate content: {str(e)}")
\ No newline at end of file
@@ -1,9 +1,16 @@
 """Utilities for sanitizing JSON responses"""
 
 import re
-import json
+import orjson
 from typing import Dict, Any
 
+# Compiled once; these run on every response that needs repairing
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x09\x0B\x0C\x0E-\x1F\x7F]')
+_ACTIVITY_RE = re.compile(r'"activity":\s*"(.*?)(?=",|"\s*})', re.DOTALL)
+
+# Escapes backslashes, newlines and double quotes in a single pass
+_ACTIVITY_TRANSLATE = str.maketrans({'\\': '\\\\', '\n': '\\n', '"': '\\"'})
+
 def sanitize_json_string(json_str: str) -> str:
     """
     Cleans up a JSON string to fix common issues that might cause parsing errors:
@@ -22,18 +29,15 @@ def sanitize_json_string(json_str: str) -> str:
     json_str = json_str.replace('\r\n', '\n').replace('\r', '\n')
     
     # Remove problematic control characters
-    json_str = re.sub(r'[\x00-\x09\x0B\x0C\x0E-\x1F\x7F]', '', json_str)
+    json_str = _CONTROL_CHARS_RE.sub('', json_str)
     
     # Fix activity fields with special handling
-    pattern = r'"activity":\s*"(.*?)(?=",|"\s*})'
-    
     def fix_activity(match):
-        activity = match.group(1)
         # Escape backslashes, newlines and double quotes
-        activity = activity.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        activity = match.group(1).translate(_ACTIVITY_TRANSLATE)
         return f'"activity": "{activity}'
     
-    json_str = re.sub(pattern, fix_activity, json_str, flags=re.DOTALL)
+    json_str = _ACTIVITY_RE.sub(fix_activity, json_str)
     
     return json_str
 
@@ -52,20 +56,40 @@ def safe_parse_json(json_str: str) -> Dict[str, Any]:
     """
     # First attempt: Standard JSON parsing
     try:
-        return json.loads(json_str)
-    except json.JSONDecodeError:
+        return orjson.loads(json_str)
+    except orjson.JSONDecodeError:
+        # Text around the object (e.g. a sentence before or after it) is the most
+        # common problem; cut it off and retry before the regex-based repairs
+        json_str = _strip_surrounding_text(json_str)
+        try:
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            pass
+        
         # Second attempt: Try with sanitization
         try:
             sanitized = sanitize_json_string(json_str)
-            return json.loads(sanitized)
-        except json.JSONDecodeError:
+            return orjson.loads(sanitized)
+        except orjson.JSONDecodeError:
             # Third attempt: Use a line-by-line approach
             try:
                 sanitized = sanitize_line_by_line(json_str)
-                return json.loads(sanitized)
-            except json.JSONDecodeError as e:
+                return orjson.loads(sanitized)
+            except orjson.JSONDecodeError as e:
                 raise ValueError(f"Failed to parse JSON after multiple attempts: {str(e)}")
 
+def _strip_surrounding_text(json_str: str) -> str:
+    """Slice from the first '{' to the last '}' when the string does not already start and end with them"""
+    stripped = json_str.strip()
+    if stripped.startswith('{') and stripped.endswith('}'):
+        return stripped
+    
+    start = stripped.find('{')
+    end = stripped.rfind('}')
+    if start == -1 or end < start:
+        return stripped
+    return stripped[start:end + 1]
+
 def sanitize_line_by_line(json_str: str) -> str:
     """
     Process a JSON string line by line to handle specific formatting issues
@@ -79,50 +103,44 @@ def sanitize_line_by_line(json_str: str) -> str:
     lines = json_str.split('\n')
     result = []
     
-    activity_content = False
-    activity_buffer = ""
+    # Fragments of a multi-line activity value, joined once when it ends;
+    # None while outside an activity field
+    activity_prefix = ""
+    activity_parts = None
     
     for line in lines:
         stripped = line.strip()
+        before, marker, content = stripped.partition('"activity":')
         
         # Check if we're entering an activity field
-        if '"activity":' in stripped:
-            activity_content = True
-            
-            # Extract everything before the value starts
-            prefix = stripped.split('"activity":', 1)[0] + '"activity": "'
+        if marker:
+            # Everything before the value starts
+            prefix = before + '"activity": "'
+            content = content.strip()
             
-            # Handle if there's content after the activity field starts
-            if '"activity":' in stripped and stripped.endswith('"') and stripped.count('"') > 3:
+            if stripped.endswith('"') and stripped.count('"') > 3 and content.startswith('"') and content.endswith('"'):
                 # Activity starts and ends on this line
-                content = stripped.split('"activity":', 1)[1].strip()
-                if content.startswith('"') and content.endswith('"'):
-                    content = content[1:-1]  # Remove quotes
-                    content = content.replace('"', '\\"')  # Escape quotes
-                    activity_content = False
-                    result.append(f'{prefix}{content}"')
-                else:
-                    # Start collecting multi-line activity
-                    activity_buffer = content
+                content = content[1:-1].replace('"', '\\"')  # Remove and escape quotes
+                activity_parts = None
+                result.append(f'{prefix}{content}"')
             else:
-                # Activity continues to next lines
-                content = stripped.split('"activity":', 1)[1].strip()
+                # Start collecting multi-line activity
                 if content.startswith('"'):
                     content = content[1:]  # Remove opening quote
-                activity_buffer = content
+                activity_prefix = prefix
+                activity_parts = [content]
         
         # If we're inside an activity field
-        elif activity_content:
+        elif activity_parts is not None:
             if stripped.endswith('"') and not stripped.endswith('\\"'):
                 # This is the end of the activity
-                activity_content = False
-                activity_buffer += " " + stripped[:-1]  # Exclude closing quote
-                activity_buffer = activity_buffer.replace('"', '\\"').replace('\n', '\\n')
-                result.append(f'{activity_buffer}"')
-                activity_buffer = ""
+                activity_parts.append(stripped[:-1])  # Exclude closing quote
+                activity = " ".join(activity_parts).replace('"', '\\"')
+                result.append(f'{activity_prefix}{activity}"')
+                activity_parts = None
             else:
                 # Continue collecting activity content
-                activity_buffer += " " + stripped
+                activity_parts.append(stripped)
         
         # Regular line (not part of activity)
         else:
@@ -0,0 +1,91 @@
+"""Per-user concurrent request limiting"""
+
+import secrets
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+
+
+class UserConcurrencyLimiter:
+    """
+    Tracks in-flight requests per user and rejects new ones above a limit.
+
+    Each user has a set of request IDs scored by start time. Entries older than
+    the window are treated as abandoned (e.g. a worker died before releasing)
+    and dropped before counting, so a user can never be locked out for good.
+    """
+
+    def __init__(self, limit: int, window_seconds: float):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._active: Dict[str, Dict[str, float]] = {}
+
+    def acquire(self, key: str) -> Optional[str]:
+        """
+        Try to start a request for the given user
+
+        Args:
+            key: The user identifier
+
+        Returns:
+            A request ID to pass to release(), or None if the user is at the limit
+        """
+        now = time.time()
+        active = self._active.setdefault(key, {})
+
+        # Drop stale entries before counting
+        cutoff = now - self.window_seconds
+        for request_id in [rid for rid, started in active.items() if started <= cutoff]:
+            del active[request_id]
+
+        if len(active) >= self.limit:
+            return None
+
+        request_id = secrets.token_hex(4)
+        active[request_id] = now
+        return request_id
+
+    def release(self, key: str, request_id: str) -> None:
+        """Mark a request started with acquire() as finished"""
+        active = self._active.get(key)
+        if active is None:
+            return
+        active.pop(request_id, None)
+        if not active:
+            del self._active[key]
+
+
+user_concurrency_limiter = UserConcurrencyLimiter(
+    limit=settings.USER_MAX_CONCURRENT_REQUESTS,
+    window_seconds=settings.USER_REQUEST_TIMEOUT_SECONDS,
+)
+
+
+async def limit_user_concurrency(request: Request, user_id: Optional[str] = None):
+    """
+    FastAPI dependency capping concurrent requests per user
+
+    Requests without a user_id are not limited, unless RATE_LIMIT_ANONYMOUS_BY_ADDRESS
+    is set, in which case they are limited per client address. Responds with HTTP 429
+    when the user already has the maximum number of requests running.
+    """
+    if user_id:
+        key = user_id
+    elif settings.RATE_LIMIT_ANONYMOUS_BY_ADDRESS:
+        key = request.client.host if request.client else "anonymous"
+    else:
+        yield
+        return
+    request_id = user_concurrency_limiter.acquire(key)
+    if request_id is None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many concurrent requests for this user. Please wait for a previous request to finish."
+        )
+    try:
+        yield
+    finally:
+        user_concurrency_limiter.release(key, request_id)
@@ -0,0 +1,180 @@
+"""In-process response cache with optional on-disk persistence"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import orjson
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cache policies:
+# - enabled:    read from the cache, write misses back to it
+# - replay:     read from the cache only, a miss is an error (no upstream call)
+# - write-only: always call upstream, but record every response
+# - disabled:   bypass the cache entirely
+CACHE_POLICIES = ("enabled", "replay", "write-only", "disabled")
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a response is not in the cache"""
+
+
+class ResponseCache:
+    def __init__(self,
+                 policy: str = "enabled",
+                 ttl_seconds: Optional[float] = None,
+                 max_entries: int = 1024,
+                 cache_dir: Optional[str] = None):
+        if policy not in CACHE_POLICIES:
+            policy = "enabled"
+        self.policy = policy
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir or None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Lookup counters, reset by clear()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def can_read(self) -> bool:
+        return self.policy in ("enabled", "replay")
+
+    @property
+    def can_write(self) -> bool:
+        return self.policy in ("enabled", "write-only")
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Build a stable cache key from the given parts"""
+        return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value
+
+        Args:
+            key: The cache key
+
+        Returns:
+            A fresh copy of the cached value, or None on a miss
+        """
+        if not self.can_read:
+            return None
+
+        entry = self._entries.get(key)
+        from_disk = False
+        if entry is None and self.cache_dir:
+            # Disk I/O runs on a worker thread to keep the event loop free
+            entry = await asyncio.to_thread(self._read_from_disk, key)
+            from_disk = entry is not None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, payload = entry
+        if expires_at is not None and expires_at < time.time():
+            # Removes the file too, so expired entries don't pile up on disk
+            await self.delete(key)
+            self.misses += 1
+            return None
+
+        if from_disk:
+            await self._store(key, entry)
+        else:
+            self._entries.move_to_end(key)
+        self.hits += 1
+        # Values are kept serialized so every caller gets its own copy
+        return orjson.loads(payload)
+
+    async def set(self, key: str, value: Any) -> None:
+        """
+        Store a value in the cache
+
+        Args:
+            key: The cache key
+            value: Any JSON-serializable value
+        """
+        if not self.can_write:
+            return
+
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        entry = (expires_at, orjson.dumps(value).decode())
+        await self._store(key, entry)
+
+        if self.cache_dir:
+            await asyncio.to_thread(self._write_to_disk, key, entry)
+
+    async def delete(self, key: str) -> None:
+        """Drop a single entry, in memory and on disk"""
+        self._entries.pop(key, None)
+
+        if self.cache_dir:
+            await asyncio.to_thread(self._remove_from_disk, key)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries and reset the counters"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    async def _store(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            # Evict from disk too, so the cache directory stays bounded
+            if self.cache_dir:
+                await asyncio.to_thread(self._remove_from_disk, evicted_key)
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_from_disk(self, key: str) -> Optional[tuple]:
+        try:
+            with open(self._path_for(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["expires_at"], data["payload"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_to_disk(self, key: str, entry: tuple) -> None:
+        expires_at, payload = entry
+        try:
+            with open(self._path_for(key), "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "payload": payload}, f)
+        except OSError as e:
+            logger.warning("Error writing response cache entry: %s", e)
+
+    def _remove_from_disk(self, key: str) -> None:
+        try:
+            os.remove(self._path_for(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Error deleting response cache entry: %s", e)
+
+
+# Shared across requests; GeminiClient itself is created per request
+gemini_response_cache = ResponseCache(
+    policy=settings.GEMINI_CACHE_POLICY,
+    ttl_seconds=settings.GEMINI_CACHE_TTL_SECONDS,
+    max_entries=settings.GEMINI_CACHE_MAX_ENTRIES,
+    cache_dir=settings.GEMINI_CACHE_DIR,
+)
+
+
+def get_gemini_response_cache() -> ResponseCache:
+    """FastAPI dependency returning the shared Gemini response cache"""
+    return gemini_response_cache
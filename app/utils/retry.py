@@ -0,0 +1,44 @@
+"""Retrying of transient upstream failures with exponential backoff"""
+
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def retry_async(fn: Callable[[], Awaitable[Any]],
+                      is_transient: Callable[[Exception], bool],
+                      attempts: int = 4,
+                      initial_delay: float = 0.5,
+                      max_delay: float = 8.0) -> Any:
+    """
+    Run fn(), retrying transient failures with jittered exponential backoff
+
+    The n-th retry waits between half and all of min(max_delay, initial_delay * 2**(n-1))
+    seconds, so concurrent callers that failed together do not retry together.
+
+    Args:
+        fn: Zero-argument coroutine function performing the call
+        is_transient: Returns True for errors worth retrying (rate limits, 5xx, timeouts)
+        attempts: Total number of attempts, including the first
+        initial_delay: Backoff before the first retry, in seconds
+        max_delay: Upper bound on a single backoff, in seconds
+
+    Returns:
+        The result of the first successful call
+
+    Raises:
+        The last error if it is not transient or all attempts failed
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            backoff = min(max_delay, initial_delay * 2 ** (attempt - 1))
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+            logger.warning("Transient error (attempt %d/%d), retrying in %.2fs: %s", attempt, attempts, delay, e)
+            await asyncio.sleep(delay)
@@ -0,0 +1,47 @@
+"""Coalescing of identical concurrent async calls"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Ensures only one call per key is in flight at a time.
+
+    Concurrent callers with the same key await the first caller's result
+    instead of issuing their own call. Safe without locks because all
+    callers run on the same event loop.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() for the given key, or join an identical call already in flight
+
+        The call runs as its own task, so cancelling any caller (including the
+        one that started it, e.g. when its client disconnects) only stops that
+        caller waiting; the others still get the result.
+
+        Args:
+            key: Identifies calls that can share a result
+            fn: Zero-argument coroutine function performing the real call
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller stopped waiting
+        if not task.cancelled():
+            task.exception()
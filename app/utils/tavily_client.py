@@ -1,103 +1,188 @@
-from typing import Dict, Any, List, Optional
-from tavily import TavilyClient
-from app.core.config import settings
-
-
-class TavilySearchClient:
-    def __init__(self):
-        # Initialize Tavily client with API key
-        self.client = TavilyClient(api_key=settings.TAVILY_API_KEY)
-        
-    async def search(self, query: str, search_depth: str = "basic", max_results: int = 5) -> Dict[str, Any]:
-        """
-        Perform a web search using Tavily API
-        
-        Args:
-            query: The search query string
-            search_depth: 'basic' for faster results, 'advanced' for more comprehensive search
-            max_results: Maximum number of search results to return
-            
-        Returns:
-            Dictionary containing search results and metadata
-        """
-        try:
-            # Check if API key is configured
-            if not settings.TAVILY_API_KEY:
-                print("Warning: TAVILY_API_KEY is not set in environment variables")
-                return {"results": []}
-                
-            # Validate search depth
-            if search_depth not in ["basic", "advanced"]:
-                search_depth = "basic"
-                
-            print(f"Performing Tavily search for: '{query[:50]}...' (depth: {search_depth}, max_results: {max_results})")
-                
-            # Execute search
-            response = self.client.search(
-                query=query,
-                search_depth=search_depth,
-                max_results=max_results
-            )
-            
-            result_count = len(response.get("results", []))
-            print(f"Tavily search complete - found {result_count} results")
-            
-            return response
-        except Exception as e:
-            print(f"Error performing Tavily search: {str(e)}")
-            # Return empty results rather than failing completely
-            return {"results": []}
-    async def search_with_context(self, 
-                                 query: str,
-                                 context: str, 
-                                 search_depth: str = "basic", 
-                                 max_results: int = 5) -> Dict[str, Any]:
-        """
-        Perform a web search with additional context using Tavily API
-        
-        Args:
-            query: The search query string
-            context: Additional context to help guide the search
-            search_depth: 'basic' for faster results, 'advanced' for more comprehensive search
-            max_results: Maximum number of search results to return
-            
-        Returns:
-            Dictionary containing search results and metadata
-        """
-        try:
-            # Combine query with context
-            enhanced_query = f"{query} {context}"
-            
-            # Execute search
-            return await self.search(enhanced_query, search_depth, max_results)
-        except Exception as e:
-            print(f"Error performing Tavily search with context: {str(e)}")
-            # Return empty results rather than failing completely
-            return {"results": []}
-    
-    async def extract_resource_info(self, search_results: Dict[str, Any]) -> List[Dict[str, str]]:
-        """
-        Extract clean, formatted resources from Tavily search results
-        
-        Args:
-            search_results: The Tavily search results dictionary
-            
-        Returns:
-            List of resources with title, url, and snippet
-        """
-        resources = []
-        
-        try:
-            if "results" in search_results:
-                for result in search_results["results"]:
-                    resource = {
-                        "title": result.get("title", "Untitled Resource"),
-                        "url": result.get("url", ""),
-                        "snippet": result.get("content", "No description available")[:200] + "..."
-                    }
-                    resources.append(resource)
-                    
-            return resources
-        except Exception as e:
-            print(f"Error extracting resource information: {str(e)}")
-            return []
+import asyncio
+import logging
+from functools import lru_cache
+import requests
+from typing import Dict, Any, List, Optional
+from tavily import TavilyClient
+from tavily import errors as tavily_errors
+from app.core.config import settings
+from app.utils.response_cache import ResponseCache
+from app.utils.retry import retry_async
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Search results shared across requests; many tasks produce the same query
+_search_cache = ResponseCache(
+    ttl_seconds=settings.TAVILY_CACHE_TTL_SECONDS,
+    max_entries=settings.TAVILY_CACHE_MAX_ENTRIES,
+)
+
+# Shared across requests, like the cache; TavilySearchClient is created per request
+_inflight_searches = SingleFlight()
+
+# Upper bound on concurrent Tavily API calls across all requests, to respect its rate limits
+MAX_CONCURRENT_SEARCHES = 8
+_search_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+
+
+# The SDK turns timeouts into its own TimeoutError and HTTP 429 into UsageLimitExceededError;
+# connection errors and other HTTP errors (5xx) come through from requests
+_TRANSIENT_SEARCH_ERRORS = (
+    tavily_errors.TimeoutError,
+    tavily_errors.UsageLimitExceededError,
+    requests.ConnectionError,
+)
+
+
+def _is_transient_search_error(error: Exception) -> bool:
+    """Connection problems, timeouts, rate limiting and 5xx responses are worth retrying"""
+    if isinstance(error, _TRANSIENT_SEARCH_ERRORS):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
+@lru_cache(maxsize=1)
+def _get_client() -> TavilyClient:
+    """Create the Tavily client once per process and reuse it across requests"""
+    return TavilyClient(api_key=settings.TAVILY_API_KEY)
+
+
+class TavilySearchClient:
+    @property
+    def client(self) -> TavilyClient:
+        # Created lazily: TavilyClient refuses an empty API key, and search()
+        # handles a missing key by returning no results instead of failing
+        return _get_client()
+        
+    async def search(self, query: str, search_depth: str = "basic", max_results: int = 5) -> Dict[str, Any]:
+        """
+        Perform a web search using Tavily API
+        
+        Args:
+            query: The search query string
+            search_depth: 'basic' for faster results, 'advanced' for more comprehensive search
+            max_results: Maximum number of search results to return
+            
+        Returns:
+            Dictionary containing search results and metadata
+        """
+        try:
+            # Check if API key is configured
+            if not settings.TAVILY_API_KEY:
+                logger.warning("TAVILY_API_KEY is not set in environment variables")
+                return {"results": []}
+                
+            # Validate search depth
+            if search_depth not in ["basic", "advanced"]:
+                search_depth = "basic"
+                
+            cache_key = ResponseCache.make_key(query, search_depth, max_results)
+            cached = await _search_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Tavily cache hit for: '%s...' (hits: %d, misses: %d)", query[:50], _search_cache.hits, _search_cache.misses)
+                return cached
+                
+            # Identical searches already in flight (e.g. near-duplicate quests in
+            # the same month) share that call instead of issuing their own
+            return await _inflight_searches.do(
+                cache_key, lambda: self._search_and_cache(query, search_depth, max_results, cache_key)
+            )
+        except Exception as e:
+            logger.warning("Error performing Tavily search: %s", e)
+            # Return empty results rather than failing completely
+            return {"results": []}
+
+    async def _search_and_cache(self, query: str, search_depth: str, max_results: int, cache_key: str) -> Dict[str, Any]:
+        """Call the Tavily API and cache the response; errors propagate to search()"""
+        logger.debug("Performing Tavily search for: '%s...' (depth: %s, max_results: %d)", query[:50], search_depth, max_results)
+        
+        # Execute search; the Tavily SDK is blocking, so run it on a worker
+        # thread to keep the event loop free for the other searches.
+        # Transient failures are retried; the semaphore is only held for each
+        # API call, not for cache hits, shared calls or while backing off
+        async def call_tavily():
+            async with _search_semaphore:
+                return await asyncio.to_thread(
+                    self.client.search,
+                    query=query,
+                    search_depth=search_depth,
+                    max_results=max_results
+                )
+        
+        response = await retry_async(call_tavily, _is_transient_search_error)
+        
+        logger.debug("Tavily search complete - found %d results", len(response.get("results", [])))
+        
+        await _search_cache.set(cache_key, response)
+        
+        return response
+
+    async def search_with_context(self, 
+                                 query: str,
+                                 context: str, 
+                                 search_depth: str = "basic", 
+                                 max_results: int = 5) -> Dict[str, Any]:
+        """
+        Perform a web search with additional context using Tavily API
+        
+        Args:
+            query: The search query string
+            context: Additional context to help guide the search
+            search_depth: 'basic' for faster results, 'advanced' for more comprehensive search
+            max_results: Maximum number of search results to return
+            
+        Returns:
+            Dictionary containing search results and metadata
+        """
+        try:
+            # Combine query with context
+            enhanced_query = f"{query} {context}"
+            
+            # Execute search
+            return await self.search(enhanced_query, search_depth, max_results)
+        except Exception as e:
+            logger.warning("Error performing Tavily search with context: %s", e)
+            # Return empty results rather than failing completely
+            return {"results": []}
+    
+    async def extract_resource_info(self, search_results: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        Extract clean, formatted resources from Tavily search results
+        
+        Args:
+            search_results: The Tavily search results dictionary
+            
+        Returns:
+            List of resources with title, url, and snippet
+        """
+        resources = []
+        
+        try:
+            if "results" in search_results:
+                for result in search_results["results"]:
+                    resource = {
+                        "title": result.get("title", "Untitled Resource"),
+                        "url": result.get("url", ""),
+                        "snippet": result.get("content", "No description available")[:200] + "..."
+                    }
+                    resources.append(resource)
+                    
+            return resources
+        except Exception as e:
+            logger.warning("Error extracting resource information: %s", e)
+            return []
+    
+    def extract_urls(self, search_results: Dict[str, Any]) -> List[str]:
+        """
+        Extract just the result URLs from Tavily search results
+        
+        Args:
+            search_results: The Tavily search results dictionary
+            
+        Returns:
+            List of non-empty result URLs
+        """
+        return [result["url"] for result in search_results.get("results", []) if result.get("url")]
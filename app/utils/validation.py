@@ -1,9 +1,56 @@
 """Utility functions for validating model data"""
 
+import logging
 import re
-from typing import List, Union, Dict, Any
+from functools import lru_cache, singledispatch
+from typing import Iterator, List, Optional, Union, Dict, Any
 from app.models.weekly_roadmap import WeeklyTask, MonthlyRoadmap
 
+logger = logging.getLogger(__name__)
+
+# Compiled once; these run for every line of every task practice. Callers check
+# isdigit() on the first character before matching _NUM_PREFIX_RE, which skips the
+# regex engine for unnumbered lines (isdigit accepts every character \d matches)
+_NUM_PREFIX_RE = re.compile(r'\d+\.')
+_NUM_ONLY_RE = re.compile(r'\d+\.\Z')
+# A step number ("12. ") in the middle of a line, i.e. not at the start of a line
+# and not the tail of a longer number
+_NUM_INLINE_RE = re.compile(r'(?<=[^\n\d])(\d+\.) ')
+
+# Turns carriage returns into newlines and deletes the other control characters
+# (everything below 0x20 except the newline, plus DEL) in a single pass
+_NORMALIZE_TABLE = str.maketrans(
+    {'\r': '\n', **{code: None for code in (*range(0x00, 0x0A), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F)}}
+)
+# Deletes every control character, newlines included
+_CTRL_DELETE = dict.fromkeys((*range(0x00, 0x20), 0x7F), None)
+
+def _iter_clean_lines(activity: str) -> Iterator[str]:
+    """Yield the stripped, non-empty lines of an activity string"""
+    for line in activity.split('\n'):
+        if stripped := line.strip():
+            yield stripped
+
+def _parse_numbered_lines(activity: str) -> Optional[List[str]]:
+    """
+    Split an activity string into its numbered steps
+    
+    Args:
+        activity: The activity string to parse
+        
+    Returns:
+        The stripped non-empty lines if there is at least one and all of them are
+        numbered, otherwise None
+    """
+    lines = []
+    # Stop at the first line that isn't numbered
+    for line in _iter_clean_lines(activity):
+        if not (line[0].isdigit() and _NUM_PREFIX_RE.match(line)):
+            return None
+        lines.append(line)
+    
+    return lines or None
+
 def validate_activity_format(activity: str) -> bool:
     """
     Validates that an activity string is properly formatted as numbered steps
@@ -17,18 +64,41 @@ def validate_activity_format(activity: str) -> bool:
     if not activity:
         return False
     
-    # Split into lines
-    lines = [line.strip() for line in activity.split('\n') if line.strip()]
+    return _parse_numbered_lines(activity) is not None
+
+def _is_formatted(activity: str) -> bool:
+    """
+    Check whether an activity string is already exactly in the form format_activity produces
     
-    # Must have at least one line
-    if not lines:
+    That is: no control characters, and every line is a numbered step with text after
+    the number, no surrounding whitespace and no other step run into it
+    """
+    if not activity.replace('\n', '').isprintable() or _NUM_INLINE_RE.search(activity):
         return False
     
-    # Check if lines start with numbers
-    numbered_lines = [re.match(r'^\d+\.', line) is not None for line in lines]
+    for line in activity.split('\n'):
+        if not line or line.strip() != line:
+            return False
+        if not (line[0].isdigit() and _NUM_PREFIX_RE.match(line)) or _NUM_ONLY_RE.match(line):
+            return False
     
-    # All lines should be numbered
-    return all(numbered_lines)
+    return True
+
+@singledispatch
+def _coerce_activity(activity: Any) -> str:
+    """Turn an activity of any type into a string, dispatching on its type"""
+    return str(activity)
+
+@_coerce_activity.register
+def _coerce_activity_str(activity: str) -> str:
+    return activity
+
+@_coerce_activity.register
+def _coerce_activity_list(activity: list) -> str:
+    # One step per non-empty item
+    if all(isinstance(item, str) for item in activity):
+        return "\n".join(stripped for item in activity if (stripped := item.strip()))
+    return "\n".join(stripped for item in activity if (stripped := str(item).strip()))
 
 def format_activity(activity: Union[str, List[str], Dict[str, Any], Any]) -> str:
     """
@@ -40,81 +110,53 @@ def format_activity(activity: Union[str, List[str], Dict[str, Any], Any]) -> str
     Returns:
         str: Properly formatted activity string
     """
-    # Handle different input types
-    if isinstance(activity, list):
-        if all(isinstance(item, str) for item in activity):
-            activity = "\n".join(item.strip() for item in activity if item.strip())
+    activity = _coerce_activity(activity)
+    
+    # Nothing to format, and not worth a cache entry
+    if not activity:
+        return ""
+    
+    return _format_activity_str(activity)
+
+@lru_cache(maxsize=1024)
+def _format_activity_str(activity: str) -> str:
+    """
+    Format an activity string, see format_activity
+    
+    Cached because LLM output often repeats practice text verbatim across weeks
+    and months, and across requests for the same persona.
+    """
+    # Well-formed LLM output (the common case) needs no changes
+    if _is_formatted(activity):
+        return activity
+    
+    # Normalize line endings and remove problematic control characters. A '\r\n'
+    # becomes two newlines, which is harmless as empty lines are dropped below
+    activity = activity.translate(_NORMALIZE_TABLE)
+    
+    lines = _parse_numbered_lines(activity)
+    if lines is not None:
+        # Already properly formatted: one step per line, with a space after a bare
+        # step number, and any steps run together on one line split onto their own
+        activity = "\n".join(f"{line} " if _NUM_ONLY_RE.match(line) else line for line in lines)
+        return _NUM_INLINE_RE.sub(r'\n\1 ', activity)
+    
+    # Not properly formatted: group the lines into steps, each starting at a numbered
+    # line, with any following unnumbered lines as continuations (accidental line
+    # breaks within a step). Text before the first numbered line is its own step.
+    steps = []
+    for line in _iter_clean_lines(activity):
+        if line[0].isdigit() and _NUM_PREFIX_RE.match(line):
+            steps.append((True, [line]))
+        elif steps:
+            steps[-1][1].append(line)
         else:
-            activity = "\n".join(str(item).strip() for item in activity if str(item).strip())
-    elif not isinstance(activity, str):
-        activity = str(activity)
-    
-    # Normalize line endings and remove problematic control characters
-    activity = activity.replace('\r\n', '\n').replace('\r', '\n')
-    activity = re.sub(r'[\x00-\x09\x0B\x0C\x0E-\x1F\x7F]', '', activity)
-    
-    # Check if the activity is already properly formatted
-    if validate_activity_format(activity):
-        # Make sure each numbered step is on its own line
-        processed_activity = ""
-        for i, line in enumerate(activity.split('\n')):
-            stripped = line.strip()
-            if stripped:
-                # If this line starts with a number, add a newline before it (unless it's the first line)
-                if re.match(r'^\d+\.', stripped) and i > 0:
-                    processed_activity += f"\n{stripped}"
-                else:
-                    processed_activity += stripped
-                
-                # Add a space after each numbered step if there isn't one already
-                if re.match(r'^\d+\.$', stripped):
-                    processed_activity += " "
-        
-        # Ensure correct formatting with numbers on new lines
-        for i in range(10, 0, -1):  # Start from 10 to avoid replacing parts of larger numbers
-            processed_activity = processed_activity.replace(f"{i}. ", f"\n{i}. ")
-        
-        # Clean up any double newlines and leading newlines
-        activity = processed_activity.replace("\n\n", "\n").lstrip("\n")
-    else:
-        # Not properly formatted, so format it as a numbered list
-        lines = [line.strip() for line in activity.split("\n") if line.strip()]
-        
-        # Check if text has accidental line breaks within a single step
-        merged_lines = []
-        current_line = ""
-        
-        for line in lines:
-            # If line starts with a number, it's a new step
-            if re.match(r'^\d+\.', line):
-                if current_line:  # Save the previous step if it exists
-                    merged_lines.append(current_line)
-                current_line = line
-            else:
-                # This line is a continuation of the previous step
-                if current_line:
-                    current_line += " " + line
-                else:
-                    current_line = line
-        
-        # Don't forget the last line
-        if current_line:
-            merged_lines.append(current_line)
-        
-        # Now number any lines that don't already have numbers
-        numbered_lines = []
-        counter = 1
-        
-        for line in merged_lines:
-            if re.match(r'^\d+\.', line):
-                # Line already has a number, keep it as is
-                numbered_lines.append(line)
-            else:
-                # Add a number to this line
-                numbered_lines.append(f"{counter}. {line}")
-                counter += 1
-        
-        activity = "\n".join(numbered_lines)
+            steps.append((False, [line]))
+    
+    # Join continuation lines into their step and number the leading unnumbered text
+    activity = "\n".join(
+        " ".join(lines) if numbered else f"1. {' '.join(lines)}" for numbered, lines in steps
+    )
     
     return activity
 
@@ -129,28 +171,29 @@ def validate_monthly_roadmap(roadmap: MonthlyRoadmap) -> MonthlyRoadmap:
         MonthlyRoadmap: The validated and fixed roadmap
     """
     # Exit early if the roadmap is None or doesn't have weeks
-    if not roadmap or not hasattr(roadmap, 'weeks') or not roadmap.weeks:
+    if not roadmap or not roadmap.weeks:
         return roadmap
         
     try:
         # Ensure all activities in all tasks are properly formatted
+        # The model schema guarantees weeks have tasks and tasks have a practice field
         for week in roadmap.weeks:
-            if hasattr(week, 'tasks'):
-                for i, task in enumerate(week.tasks):
-                    if task and hasattr(task, 'practice') and task.practice:
-                        try:
-                            # Format the practice field to ensure it's a properly formatted numbered list
-                            week.tasks[i].practice = format_activity(task.practice)
-                        except Exception as e:
-                            # If formatting fails, at least make sure it's a valid string
-                            print(f"Error formatting task practice: {str(e)}")
-                            if not isinstance(task.practice, str):
-                                week.tasks[i].practice = str(task.practice)
-                            
-                            # Remove any control characters that could cause rendering issues
-                            week.tasks[i].practice = re.sub(r'[\x00-\x1F\x7F]', '', week.tasks[i].practice)
+            for task in week.tasks:
+                practice = task.practice
+                if practice:
+                    try:
+                        # Format the practice field to ensure it's a properly formatted numbered list
+                        task.practice = format_activity(practice)
+                    except Exception as e:
+                        # If formatting fails, at least make sure it's a valid string
+                        logger.debug("Error formatting task practice: %s", e, exc_info=True)
+                        if not isinstance(practice, str):
+                            practice = str(practice)
+                        
+                        # Remove any control characters that could cause rendering issues
+                        task.practice = practice.translate(_CTRL_DELETE)
     except Exception as e:
-        print(f"Error in validate_monthly_roadmap: {str(e)}")
+        logger.exception("Error in validate_monthly_roadmap: %s", e)
         # Don't fail the whole process due to validation issues
     
     return roadmap
@@ -1,13 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.api.router import api_router
 from app.core.config import settings
+from app.core.logging_config import setup_logging
+
+setup_logging()
 
 app = FastAPI(
     title="AI Personal Guide API",
     description="Survey-Based Persona Detection and AI-Generated Roadmap API",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -0,0 +1,64 @@
+"""Retrying of Tavily searches on the errors the Tavily SDK actually raises"""
+
+import asyncio
+
+import pytest
+import requests
+from tavily import TavilyClient
+
+from app.utils.retry import retry_async
+from app.utils.tavily_client import _is_transient_search_error
+
+
+def _response(status_code: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b'{"detail": {"error": "test error"}}'
+    return response
+
+
+def _client_failing_with(*failures) -> TavilyClient:
+    """A TavilyClient whose HTTP calls go through the given responses/exceptions in order"""
+    client = TavilyClient(api_key="tvly-test")
+    outcomes = iter(failures)
+
+    def post(*args, **kwargs):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    client.session.post = post
+    return client
+
+
+def _search_with_retry(client: TavilyClient, attempts: int = 2):
+    return asyncio.run(retry_async(
+        lambda: asyncio.to_thread(client.search, query="python"),
+        _is_transient_search_error,
+        attempts=attempts,
+        initial_delay=0,
+    ))
+
+
+@pytest.mark.parametrize("failure", [
+    _response(429),
+    _response(503),
+    requests.Timeout(),
+    requests.ConnectionError(),
+])
+def test_transient_errors_are_retried(failure):
+    ok = _response(200)
+    ok._content = b'{"results": [{"url": "https://example.com"}]}'
+    client = _client_failing_with(failure, ok)
+
+    assert _search_with_retry(client) == {"results": [{"url": "https://example.com"}]}
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 403])
+def test_permanent_errors_are_not_retried(status_code):
+    client = _client_failing_with(_response(status_code), _response(200))
+
+    with pytest.raises(Exception) as excinfo:
+        _search_with_retry(client)
+    assert not _is_transient_search_error(excinfo.value)